@@ -0,0 +1,83 @@
+"""Context compaction module for Opper AI exploration"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+# Rough chars-per-token ratio for English text, good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+DEFAULT_FIELDS = ("ticket_id", "issue_description", "issue_resolution")
+
+
+def estimate_tokens(value: Any) -> int:
+    """Estimate the number of tokens a value takes up in a prompt."""
+    text = value if isinstance(value, str) else json.dumps(value)
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _parse_content(content: str) -> Dict[str, Any]:
+    try:
+        parsed = json.loads(content)
+    except (TypeError, ValueError):
+        return {"content": content}
+    return parsed if isinstance(parsed, dict) else {"content": content}
+
+
+def compact_results(
+    results: Sequence[Any],
+    min_score: float = 0.0,
+    dedupe_threshold: float = 0.8,
+    token_budget: int = 1000,
+    fields: Sequence[str] = DEFAULT_FIELDS,
+    dedupe_field: Optional[str] = "issue_description",
+) -> List[Dict[str, Any]]:
+    """Compact knowledge base query results before passing them to a call.
+
+    Hits below ``min_score`` are dropped, near-identical hits (word shingle
+    Jaccard similarity of ``dedupe_field`` at or above ``dedupe_threshold``) are
+    collapsed into the highest scoring one, and only ``fields`` are kept from the
+    JSON content. Results are added in score order until ``token_budget`` is
+    reached; results that would exceed it are skipped.
+    """
+    ranked = sorted(
+        (r for r in results if r.score >= min_score),
+        key=lambda r: r.score,
+        reverse=True,
+    )
+
+    compacted = []
+    seen_shingles = []
+    used_tokens = 0
+    for result in ranked:
+        document = _parse_content(result.content)
+        entry = {field: document[field] for field in fields if field in document}
+        if not entry:
+            entry = {"content": result.content}
+
+        if dedupe_field and dedupe_field in document:
+            shingles = _shingles(str(document[dedupe_field]))
+            if any(_jaccard(shingles, s) >= dedupe_threshold for s in seen_shingles):
+                continue
+            seen_shingles.append(shingles)
+
+        tokens = estimate_tokens(entry)
+        if used_tokens + tokens > token_budget:
+            continue
+        used_tokens += tokens
+        compacted.append(entry)
+
+    return compacted
@@ -5,8 +5,20 @@ import os
 from typing import Literal
 
 from opperai import Opper
+from opperai.errors import NotFoundError
 from pydantic import BaseModel
 
+from opperexploration.context_compaction import compact_results
+from opperexploration.resilience import Resilience, deadline
+from opperexploration.similarity_cache import SimilarityCache
+from opperexploration.trace_analysis import SpanRecorder, analyze, format_report
+from opperexploration.workflow import Workflow
+
+# User issues arrive with trivial variations ("Can't login", "cannot log in!").
+# A suggestion is only reused for the same retrieved tickets, and for an hour at
+# most since resolutions in the knowledge base get updated.
+resolution_cache = SimilarityCache(thresholds={"suggest_resolution": 0.9}, ttl=3600)
+
 
 class SupportTicket(BaseModel):
     ticket_id: str
@@ -23,12 +35,10 @@ class SuggestResolution(BaseModel):
 
 def main():
     opper = Opper(http_bearer=os.getenv("OPPER_API_KEY"))
+    resilience = Resilience(timeout=20)
 
     knowledge_base_name = "Tickets"
-    try:
-        kb = opper.knowledge.get_by_name(knowledge_base_name=knowledge_base_name)
-    except Exception:
-        kb = opper.knowledge.create(name=knowledge_base_name)
+    user_issue = "Can't login"
 
     ticket = SupportTicket(
         ticket_id="123",
@@ -46,47 +56,138 @@ def main():
         status="resolved",
     )
 
-    opper.knowledge.add(
-        knowledge_base_id=kb.id,
-        key=ticket.ticket_id,  # unique key, will overwrite existing data with that key
-        content=ticket.model_dump_json(),
-        metadata={"source": "our_ticket_system", "status": ticket.status},
-    )
+    # Each step declares the steps it needs, the workflow runs the rest in
+    # parallel (the two queries, and the unfiltered query next to the completion)
+    def get_or_create_kb():
+        try:
+            return resilience.call(
+                opper.knowledge.get_by_name,
+                endpoint="knowledge.get_by_name",
+                knowledge_base_name=knowledge_base_name,
+            )
+        except NotFoundError:
+            return resilience.call(
+                opper.knowledge.create,
+                endpoint="knowledge.create",
+                name=knowledge_base_name,
+            )
+
+    def add_ticket(kb):
+        resilience.call(
+            opper.knowledge.add,
+            endpoint="knowledge.add",
+            knowledge_base_id=kb.id,
+            key=ticket.ticket_id,  # unique key, will overwrite existing data
+            content=ticket.model_dump_json(),
+            metadata={"source": "our_ticket_system", "status": ticket.status},
+        )
 
     # Unfiltered query results
-    unfiltered = opper.knowledge.query(
-        knowledge_base_id=kb.id,
-        query="Can't login",
-        top_k=3,
-    )
+    def query_unfiltered(kb, add_ticket, user_issue):
+        return resilience.call(
+            opper.knowledge.query,
+            endpoint="knowledge.query",
+            knowledge_base_id=kb.id,
+            query=user_issue,
+            top_k=3,
+        )
 
     # Filtered query results
-    filtered_tickets = opper.knowledge.query(
-        knowledge_base_id=kb.id,
-        query="Can't login",
-        top_k=3,
-        filters=[
-            {"field": "status", "operation": "=", "value": "resolved"},
-            {"field": "source", "operation": "=", "value": "our_ticket_system"},
-        ],
+    def query_filtered(kb, add_ticket, user_issue):
+        return resilience.call(
+            opper.knowledge.query,
+            endpoint="knowledge.query",
+            knowledge_base_id=kb.id,
+            query=user_issue,
+            top_k=3,
+            filters=[
+                {"field": "status", "operation": "=", "value": "resolved"},
+                {"field": "source", "operation": "=", "value": "our_ticket_system"},
+            ],
+        )
+
+    # Keep only relevant, distinct tickets and the fields the task needs
+    def compact_tickets(query_filtered):
+        return compact_results(query_filtered, min_score=0.3, token_budget=800)
+
+    def suggest_resolution(compact_tickets, user_issue):
+        return resolution_cache.get_or_call(
+            "suggest_resolution",
+            user_issue,
+            lambda: resilience.call(
+                opper.call,
+                endpoint="call",
+                name="suggest_resolution",
+                instructions=(
+                    "Given a user question and a list of potentially relevant past "
+                    "tickets, provide a suggestion for a resolution to the support "
+                    "agent"
+                ),
+                input={"past_tickets": compact_tickets, "user_issue": user_issue},
+                output_schema=SuggestResolution,
+            ),
+            context=compact_tickets,
+        )
+
+    query_inputs = ["kb", "add_ticket", "user_issue"]
+    flow = Workflow("support_ticket_flow")
+    flow.add("kb", get_or_create_kb)
+    flow.add("add_ticket", add_ticket, inputs=["kb"])
+    flow.add("query_unfiltered", query_unfiltered, inputs=query_inputs)
+    flow.add("query_filtered", query_filtered, inputs=query_inputs)
+    flow.add("compact_tickets", compact_tickets, inputs=["query_filtered"])
+    flow.add(
+        "suggest_resolution",
+        suggest_resolution,
+        inputs=["compact_tickets", "user_issue"],
     )
 
-    completion = opper.call(
-        name="suggest_resolution",
-        instructions=(
-            "Given a user question and a list of potentially relevant past tickets, "
-            "provide a suggestion for a resolution to the support agent"
-        ),
-        input={"past_tickets": filtered_tickets, "user_issue": "Can't login"},
-        output_schema=SuggestResolution,
-    )
+    # The whole flow shares one deadline, each call gets what is left of it
+    recorder = SpanRecorder()
+    with deadline(60):
+        results = flow.run(recorder=recorder, user_issue=user_issue)
+
+    unfiltered = results["query_unfiltered"]
+    filtered_tickets = results["query_filtered"]
+    past_tickets = results["compact_tickets"]
+    completion = results["suggest_resolution"]
 
     print("Unfiltered tickets from knowledge base query:")
     print(json.dumps([r.model_dump() for r in unfiltered], indent=2))
     print("\nFiltered tickets from knowledge base query:")
     print(json.dumps([r.model_dump() for r in filtered_tickets], indent=2))
+    print("\nCompacted tickets passed to the task:")
+    print(json.dumps(past_tickets, indent=2))
     print("\nTask completion:")
     print(json.dumps(completion.json_payload, indent=2))
+    print()
+    root = next(span for span in recorder.spans if span.parent_id is None)
+    print(format_report(analyze(recorder.spans, root.id)))
+
+    # Later issues only need retrieval and a suggestion. Rewordings of an
+    # earlier issue that retrieve the same tickets are answered from the cache.
+    resolution_flow = Workflow("resolution_flow")
+    resolution_flow.add("query_filtered", query_filtered, inputs=query_inputs)
+    resolution_flow.add("compact_tickets", compact_tickets, inputs=["query_filtered"])
+    resolution_flow.add(
+        "suggest_resolution",
+        suggest_resolution,
+        inputs=["compact_tickets", "user_issue"],
+    )
+    incoming_issues = [
+        "Cannot log in!",
+        "I can't login",
+        "How do I change the billing address on my invoices?",
+    ]
+    print("\nMore incoming issues:")
+    for issue in incoming_issues:
+        with deadline(30):
+            answer = resolution_flow.run(
+                kb=results["kb"], add_ticket=None, user_issue=issue
+            )
+        print(f"{issue}: {answer['suggest_resolution'].json_payload['message']}")
+    print("\nResolution cache:")
+    print(json.dumps(resolution_cache.report(), indent=2))
 
 
 if __name__ == "__main__":
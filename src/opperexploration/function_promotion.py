@@ -0,0 +1,241 @@
+"""Function promotion module for Opper AI exploration
+
+``opper.call`` sends the full task definition (instructions, schemas and
+examples) with every request. Once the same definition has been seen a few
+times it is registered as a function, and later calls go through
+``functions.call`` with only the input, like in task_completion_at_scale.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from opperai import Opper
+from opperai.errors import NotFoundError
+from pydantic import BaseModel
+
+
+def _to_json(value: Any) -> Any:
+    """Turn Pydantic classes into JSON schemas and instances into plain data."""
+    if isinstance(value, type) and issubclass(value, BaseModel):
+        return value.model_json_schema()
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, dict):
+        return {k: _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    return value
+
+
+class FunctionPromoter:
+    """Routes repeated inline calls through registered functions.
+
+    The task definition is hashed into a signature. After ``promote_after``
+    calls with the same signature, the task is routed to a registered function
+    from then on. A function already registered under ``name`` is used when its
+    instructions, schemas, model and configuration equal the definition and its
+    dataset holds no examples, so calls keep adding to its history. Otherwise a
+    function named ``<name>-<signature>`` is fetched or created (inline examples
+    go to its dataset), which means a changed definition never reuses a
+    function registered for an older one. Registration is all-or-nothing: a
+    function whose examples could not all be added is deleted again, and a
+    hashed function found with fewer examples than the task is recreated.
+
+    Example:
+        promoter = FunctionPromoter()
+        response = promoter.call(
+            opper, name="extractRoom", instructions="...", input=text,
+            output_schema=RoomDescription,
+        )
+    """
+
+    def __init__(self, promote_after: int = 2):
+        self.promote_after = promote_after
+        self._counts: Dict[str, int] = {}
+        self._function_ids: Dict[Tuple[str, str], str] = {}
+        self._registration_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def call(
+        self,
+        opper: Opper,
+        *,
+        name: str,
+        input: Any,
+        instructions: Optional[str] = None,
+        input_schema: Any = None,
+        output_schema: Any = None,
+        examples: Optional[List[Dict[str, Any]]] = None,
+        model: Any = None,
+        configuration: Optional[Dict[str, Any]] = None,
+        scope: str = "default",
+        **kwargs: Any,
+    ) -> Any:
+        """Call the task inline or through its registered function.
+
+        Functions are registered once per ``scope``. Pass a different scope for
+        each project the calls may go to, e.g. the shard name of a ShardedOpper.
+        Other keyword arguments (``parent_span_id``, ``tags``, ``timeout_ms``,
+        ...) are passed on to whichever SDK method handles the call, and
+        ``timeout_ms`` also bounds each registration request.
+        """
+        definition = {
+            "name": name,
+            "instructions": instructions,
+            "input_schema": _to_json(input_schema),
+            "output_schema": _to_json(output_schema),
+            "examples": _to_json(examples),
+            "model": _to_json(model),
+            "configuration": configuration,
+        }
+        signature = hashlib.sha256(
+            json.dumps(definition, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()[:12]
+
+        with self._lock:
+            self._counts[signature] = self._counts.get(signature, 0) + 1
+            promote = self._counts[signature] >= self.promote_after
+
+        if not promote:
+            task = {k: v for k, v in definition.items() if v is not None}
+            return opper.call(input=input, **task, **kwargs)
+
+        function_id = self._function_id(
+            opper, scope, signature, definition, kwargs.get("timeout_ms")
+        )
+        return opper.functions.call(
+            function_id=function_id, input=_to_json(input), **kwargs
+        )
+
+    def _function_id(
+        self,
+        opper: Opper,
+        scope: str,
+        signature: str,
+        definition: Dict[str, Any],
+        timeout_ms: Optional[int],
+    ) -> str:
+        key = (scope, signature)
+        with self._lock:
+            if key in self._function_ids:
+                return self._function_ids[key]
+            registration_lock = self._registration_locks.setdefault(
+                key, threading.Lock()
+            )
+
+        # Registration is rare, a lock per signature keeps it to one request at
+        # a time without holding up calls for other signatures
+        with registration_lock:
+            with self._lock:
+                if key in self._function_ids:
+                    return self._function_ids[key]
+
+            function = self._existing(opper, definition, timeout_ms)
+            if function is None:
+                function_name = f"{definition['name']}-{signature}"
+                try:
+                    function = opper.functions.get_by_name(
+                        name=function_name, timeout_ms=timeout_ms
+                    )
+                except NotFoundError:
+                    function = None
+
+                examples = definition["examples"] or []
+                if (
+                    function is not None
+                    and examples
+                    and self._entry_count(opper, function, timeout_ms) < len(examples)
+                ):
+                    # Left over from a registration that failed half way
+                    opper.functions.delete(
+                        function_id=function.id, timeout_ms=timeout_ms
+                    )
+                    function = None
+                if function is None:
+                    function = self._register(
+                        opper, function_name, definition, timeout_ms
+                    )
+
+            with self._lock:
+                self._function_ids[key] = function.id
+            return function.id
+
+    def _existing(
+        self, opper: Opper, definition: Dict[str, Any], timeout_ms: Optional[int]
+    ) -> Any:
+        """The function registered under the task name, if it matches the task."""
+        # Inline examples can not be compared with the function's dataset
+        if definition["examples"]:
+            return None
+        try:
+            function = opper.functions.get_by_name(
+                name=definition["name"], timeout_ms=timeout_ms
+            )
+        except NotFoundError:
+            return None
+
+        matches = (
+            function.instructions == (definition["instructions"] or "")
+            and function.input_schema == definition["input_schema"]
+            and function.output_schema == definition["output_schema"]
+            and function.model == definition["model"]
+            and (function.configuration or {}) == (definition["configuration"] or {})
+        )
+        if not matches or self._entry_count(opper, function, timeout_ms):
+            return None
+        return function
+
+    def _entry_count(
+        self, opper: Opper, function: Any, timeout_ms: Optional[int]
+    ) -> int:
+        entries = opper.datasets.list_entries(
+            dataset_id=function.dataset_id, limit=1, timeout_ms=timeout_ms
+        )
+        return entries.meta.total_count
+
+    def _register(
+        self,
+        opper: Opper,
+        function_name: str,
+        definition: Dict[str, Any],
+        timeout_ms: Optional[int],
+    ) -> Any:
+        examples = definition["examples"] or []
+        configuration = dict(definition["configuration"] or {})
+        if examples:
+            configuration.setdefault("invocation.few_shot.count", len(examples))
+
+        task = {
+            k: definition[k]
+            for k in ("input_schema", "output_schema", "model")
+            if definition[k] is not None
+        }
+        function = opper.functions.create(
+            name=function_name,
+            instructions=definition["instructions"] or "",
+            configuration=configuration or None,
+            timeout_ms=timeout_ms,
+            **task,
+        )
+
+        # Inline examples become dataset entries, used as few-shot examples
+        try:
+            for example in examples:
+                opper.datasets.create_entry(
+                    dataset_id=function.dataset_id,
+                    input=example.get("input"),
+                    output=example.get("output"),
+                    comment=example.get("comment"),
+                    timeout_ms=timeout_ms,
+                )
+        except Exception:
+            opper.functions.delete(function_id=function.id, timeout_ms=timeout_ms)
+            raise
+        return function
+
+    def promoted(self) -> Dict[str, str]:
+        """Function ids of promoted signatures, as ``scope/signature``."""
+        with self._lock:
+            return {f"{s}/{sig}": fid for (s, sig), fid in self._function_ids.items()}
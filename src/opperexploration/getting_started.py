@@ -7,6 +7,10 @@ from opperai import Opper
 # Our SDK supports Pydantic to provide structured output
 from pydantic import BaseModel
 
+from opperexploration.resilience import Resilience
+
+resilience = Resilience(timeout=20)
+
 
 # Define the output structure
 class RoomDescription(BaseModel):
@@ -20,15 +24,18 @@ def main():
     opper = Opper(http_bearer=os.getenv("OPPER_API_KEY"))
 
     # Complete a task
-    completion = opper.call(
+    room_text = (
+        "The Grand Hotel offers a luxurious suite with 3 spacious rooms, each "
+        "providing a breathtaking view of the ocean. The suite includes a "
+        "king-sized bed, an en-suite bathroom, and a private balcony for an "
+        "unforgettable stay."
+    )
+    completion = resilience.call(
+        opper.call,
+        endpoint="call",
         name="extractRoom",
         instructions="Extract details about the room from the provided text",
-        input=(
-            "The Grand Hotel offers a luxurious suite with 3 spacious rooms, each "
-            "providing a breathtaking view of the ocean. The suite includes a "
-            "king-sized bed, an en-suite bathroom, and a private balcony for an "
-            "unforgettable stay."
-        ),
+        input=room_text,
         output_schema=RoomDescription,
     )
 
@@ -4,8 +4,13 @@ import os
 from typing import List
 
 from opperai import Opper
+from opperai.errors import NotFoundError
 from pydantic import BaseModel, Field
 
+from opperexploration.resilience import Resilience
+
+resilience = Resilience(timeout=20)
+
 # --------- Schemas --------- #
 
 
@@ -35,15 +40,21 @@ def setup_function(opper: Opper):
 
     # Try to get existing function first
     try:
-        function = opper.functions.get_by_name(name=function_name)
+        function = resilience.call(
+            opper.functions.get_by_name,
+            endpoint="functions.get_by_name",
+            name=function_name,
+        )
         print(f"Function '{function_name}' already exists with ID: {function.id}")
         return function
-    except Exception:
+    except NotFoundError:
         print(f"Function '{function_name}' does not exist. Creating it...")
 
     # If function doesn't exist, create it
     try:
-        function = opper.functions.create(
+        function = resilience.call(
+            opper.functions.create,
+            endpoint="functions.create",
             name=function_name,
             instructions=(
                 "Given a room database entry, describe the room in a way that is "
@@ -67,7 +78,11 @@ def add_examples(opper: Opper, dataset_id: str):
 
     # Check if dataset already has entries
     try:
-        dataset_entries = opper.datasets.list_entries(dataset_id=dataset_id)
+        dataset_entries = resilience.call(
+            opper.datasets.list_entries,
+            endpoint="datasets.list_entries",
+            dataset_id=dataset_id,
+        )
         if len(dataset_entries.data) > 0:
             print(
                 f"Dataset {dataset_id} already has {len(dataset_entries.data)} "
@@ -160,7 +175,9 @@ def add_examples(opper: Opper, dataset_id: str):
     added_count = 0
     for i, example in enumerate(examples, 1):
         try:
-            opper.datasets.create_entry(
+            resilience.call(
+                opper.datasets.create_entry,
+                endpoint="datasets.create_entry",
                 dataset_id=dataset_id,
                 input=str(example["input"]),
                 output=str(example["output"]),
@@ -192,8 +209,11 @@ def main():
         amenities=["wifi", "breakfast"],
     )
 
-    response = opper.functions.call(
-        function_id=function.id, input=test_input.model_dump()
+    response = resilience.call(
+        opper.functions.call,
+        endpoint="functions.call",
+        function_id=function.id,
+        input=test_input.model_dump(),
     )
 
     print(f"Test input: {test_input}")
@@ -0,0 +1,350 @@
+"""Resilience module for Opper AI exploration
+
+Deadlines, retry budgets and circuit breakers around Opper SDK calls, so a slow
+or degraded platform cannot block workers indefinitely.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import httpx
+from opperai.errors import (
+    APIError,
+    BadRequestError,
+    ConflictError,
+    NotFoundError,
+    RequestValidationError,
+    UnauthorizedError,
+)
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar(
+    "cancel_event", default=None
+)
+
+# Status codes that are worth retrying, other 4xx responses will fail the same way
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# Typed SDK errors for 400/401/404/409/422 responses, which carry no status code
+CLIENT_ERRORS = (
+    BadRequestError,
+    UnauthorizedError,
+    NotFoundError,
+    ConflictError,
+    RequestValidationError,
+)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the current deadline has passed."""
+
+
+class Cancelled(Exception):
+    """Raised when the enclosing work was cancelled, e.g. by a failed step."""
+
+
+class CircuitOpenError(Exception):
+    """Raised when a circuit breaker rejects a call without trying it."""
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Run the enclosed block under a deadline.
+
+    Nested deadlines never extend an outer one, so a step inside a flow gets
+    whichever is shorter of its own budget and what is left of the flow's.
+    """
+    expires_at = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        expires_at = min(expires_at, outer)
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Return the seconds left on the current deadline, or None if unbounded."""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
+
+
+@contextmanager
+def cancel_on(event: threading.Event) -> Iterator[None]:
+    """Stop calls in the enclosed block once ``event`` is set.
+
+    Resilience.call checks the event before every attempt and wakes up from
+    backoff when it is set. Long running code of its own can poll cancelled().
+    """
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+
+def cancelled() -> bool:
+    """Return whether the current block has been cancelled."""
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a fraction of regular calls.
+
+    Every call deposits ``ratio`` tokens and every retry withdraws one, so
+    during an outage retries add at most ``ratio`` extra load instead of
+    multiplying it by the number of attempts.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_tokens: float = 5.0):
+        self.ratio = ratio
+        self.max_tokens = max(min_tokens, 10.0)
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """Circuit breaker over a sliding window of recent call outcomes.
+
+    The breaker opens once at least ``min_calls`` outcomes are recorded and the
+    error rate reaches ``error_threshold``. After ``reset_timeout`` seconds it
+    lets a single trial call through and closes again if that call succeeds.
+
+    allow() returns a token that the caller passes back to record() or
+    release(). Outcomes of calls admitted before the breaker last changed state
+    are ignored, so a slow call that started while the breaker was closed can
+    not close it, and only the trial call itself decides a half-open breaker.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        error_threshold: float = 0.5,
+        min_calls: int = 5,
+        window: int = 20,
+        reset_timeout: float = 30.0,
+    ):
+        self.name = name
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._outcomes: deque = deque(maxlen=window)
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        # Incremented on every open and close, tokens from older ones are stale
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> Tuple[int, bool]:
+        """Return a call token, or raise CircuitOpenError if no call may go now."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return (self._generation, False)
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return (self._generation, True)
+        raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+    def _is_current_trial(self, token: Tuple[int, bool]) -> bool:
+        generation, trial = token
+        return trial and generation == self._generation and self._trial_in_flight
+
+    def release(self, token: Tuple[int, bool]) -> None:
+        """Give back the half-open trial slot of a call that was not counted."""
+        with self._lock:
+            if self._is_current_trial(token):
+                self._trial_in_flight = False
+
+    def record(self, token: Tuple[int, bool], success: bool) -> None:
+        with self._lock:
+            if self._is_current_trial(token):
+                # Outcome of the half-open trial decides whether to close again
+                self._trial_in_flight = False
+                self._generation += 1
+                if success:
+                    self._opened_at = None
+                    self._outcomes.clear()
+                else:
+                    self._opened_at = time.monotonic()
+                return
+            if self._opened_at is not None or token[0] != self._generation:
+                return
+
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (
+                len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.error_threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._generation += 1
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Server errors, rate limits and transport failures (including timeouts)."""
+    if isinstance(error, APIError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+
+def _is_server_failure(error: Exception) -> bool:
+    """Errors that count against the endpoint, retryable or not (e.g. 501)."""
+    if isinstance(error, APIError) and error.status_code >= 500:
+        return True
+    return _is_retryable(error)
+
+
+def _is_client_error(error: Exception) -> bool:
+    """Responses that show the endpoint is up but rejected this request."""
+    if isinstance(error, APIError):
+        return 400 <= error.status_code < 500 and not _is_retryable(error)
+    return isinstance(error, CLIENT_ERRORS)
+
+
+class Resilience:
+    """Wraps Opper SDK calls with deadlines, retries and circuit breakers.
+
+    Example:
+        resilience = Resilience()
+        with deadline(20):
+            results = resilience.call(
+                opper.knowledge.query, endpoint="knowledge.query", ...
+            )
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        max_attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 2.0,
+        retry_budget: Optional[RetryBudget] = None,
+        breaker_factory: Callable[[str], CircuitBreaker] = CircuitBreaker,
+    ):
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_budget = retry_budget or RetryBudget()
+        self._breaker_factory = breaker_factory
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = self._breaker_factory(name)
+            return self._breakers[name]
+
+    def breaker_states(self) -> Dict[str, str]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {b.name: b.state for b in breakers}
+
+    def call(self, func: Callable[..., Any], *, endpoint: str, **kwargs: Any) -> Any:
+        """Call an SDK method under the current deadline.
+
+        Each attempt gets ``timeout_ms`` set to the smallest of the per-call
+        timeout, what is left of the deadline and any ``timeout_ms`` passed by
+        the caller. Server errors, rate limits and transport failures are
+        retried with full-jitter exponential backoff while the retry budget
+        allows it; other errors are raised right away.
+        """
+        timeout = self.timeout
+        if kwargs.get("timeout_ms") is not None:
+            timeout = min(timeout, kwargs.pop("timeout_ms") / 1000)
+        kwargs.pop("timeout_ms", None)
+
+        breakers = [self.breaker(f"endpoint:{endpoint}")]
+        model = kwargs.get("model")
+        if isinstance(model, str):
+            breakers.append(self.breaker(f"model:{model}"))
+
+        self.retry_budget.deposit()
+        with deadline(timeout * self.max_attempts):
+            attempt = 0
+            while True:
+                attempt += 1
+                if cancelled():
+                    raise Cancelled(f"Cancelled before calling {endpoint}")
+                time_left = remaining()
+                if time_left <= 0:
+                    raise DeadlineExceeded(f"Deadline exceeded calling {endpoint}")
+                tokens = []
+                for breaker in breakers:
+                    try:
+                        tokens.append(breaker.allow())
+                    except CircuitOpenError:
+                        for allowed, token in zip(breakers, tokens):
+                            allowed.release(token)
+                        raise
+
+                attempt_timeout = min(timeout, time_left)
+                try:
+                    result = func(**kwargs, timeout_ms=int(attempt_timeout * 1000))
+                except Exception as e:
+                    # Client errors mean the endpoint is up, only trip on server
+                    # and transport failures. Other errors (bad arguments,
+                    # response validation) say nothing about the endpoint.
+                    retryable = _is_retryable(e)
+                    failed = _is_server_failure(e)
+                    for breaker, token in zip(breakers, tokens):
+                        if failed or _is_client_error(e):
+                            breaker.record(token, not failed)
+                        else:
+                            breaker.release(token)
+                    if (
+                        attempt >= self.max_attempts
+                        or not retryable
+                        or not self.retry_budget.withdraw()
+                    ):
+                        raise
+                    delay = random.uniform(
+                        0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+                    )
+                    if delay >= remaining():
+                        raise
+                    event = _cancel_event.get()
+                    if event is not None:
+                        event.wait(delay)
+                    else:
+                        time.sleep(delay)
+                    continue
+
+                for breaker, token in zip(breakers, tokens):
+                    breaker.record(token, True)
+                return result
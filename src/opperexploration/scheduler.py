@@ -0,0 +1,184 @@
+"""Request scheduler module for Opper AI exploration
+
+Runs SDK calls from several traffic classes (e.g. interactive and batch) on a
+shared set of workers. Classes share the workers by weighted fair queuing, and a
+class can reserve workers that other classes are never admitted to, so a large
+batch job cannot starve interactive calls.
+"""
+
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from opperexploration.stats import percentile
+
+
+class SchedulingClass:
+    """A traffic class with a fair-queuing weight and reserved workers."""
+
+    def __init__(self, name: str, weight: float = 1.0, reserved: int = 0):
+        self.name = name
+        self.weight = weight
+        self.reserved = reserved
+        self.queue: deque = deque()
+        self.in_flight = 0
+        self.completed = 0
+        self.virtual_time = 0.0
+        self.waits: deque = deque(maxlen=1000)
+
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+DEFAULT_CLASSES = [
+    SchedulingClass(INTERACTIVE, weight=4.0, reserved=2),
+    SchedulingClass(BATCH, weight=1.0),
+]
+
+
+class PriorityScheduler:
+    """Weighted fair scheduler in front of blocking SDK calls.
+
+    Example:
+        scheduler = PriorityScheduler(max_concurrency=8)
+        future = scheduler.submit(BATCH, opper.functions.call, function_id=..., ...)
+        response = future.result()
+
+    A job is only admitted when enough workers stay free for the unused
+    reservations of the other classes. Queued batch jobs therefore give way to
+    interactive ones at admission, while jobs that already started run to the end.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        classes: Optional[List[SchedulingClass]] = None,
+    ):
+        classes = classes if classes is not None else DEFAULT_CLASSES
+        # Copy the class definitions so schedulers never share queues
+        self._classes: Dict[str, SchedulingClass] = {
+            c.name: SchedulingClass(c.name, c.weight, c.reserved) for c in classes
+        }
+        if sum(c.reserved for c in self._classes.values()) >= max_concurrency:
+            raise ValueError("Reserved workers must leave room for other classes")
+
+        self.max_concurrency = max_concurrency
+        self._virtual_time = 0.0
+        self._in_flight = 0
+        self._shutdown = False
+        self._condition = threading.Condition()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"scheduler-{i}", daemon=True)
+            for i in range(max_concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(
+        self, class_name: str, func: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> Future:
+        """Queue ``func(*args, **kwargs)`` in a traffic class and return a Future.
+
+        The caller's context (e.g. a resilience deadline) is carried over to the
+        worker that runs the call.
+        """
+        if class_name not in self._classes:
+            raise ValueError(f"Unknown scheduling class '{class_name}'")
+
+        future: Future = Future()
+        context = contextvars.copy_context()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Scheduler has been shut down")
+            scheduling_class = self._classes[class_name]
+            if not scheduling_class.queue and scheduling_class.in_flight == 0:
+                # An idle class starts at the current virtual time, so it can
+                # not claim a backlog of turns it did not use
+                scheduling_class.virtual_time = max(
+                    scheduling_class.virtual_time, self._virtual_time
+                )
+            job = (future, context, func, args, kwargs, time.monotonic())
+            scheduling_class.queue.append(job)
+            self._condition.notify()
+        return future
+
+    def _admissible(self, scheduling_class: SchedulingClass) -> bool:
+        free = self.max_concurrency - self._in_flight
+        held_back = sum(
+            max(0, c.reserved - c.in_flight)
+            for c in self._classes.values()
+            if c is not scheduling_class
+        )
+        return free > held_back
+
+    def _next_class(self) -> Optional[SchedulingClass]:
+        candidates = [
+            c for c in self._classes.values() if c.queue and self._admissible(c)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda c: c.virtual_time)
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                scheduling_class = self._next_class()
+                while scheduling_class is None:
+                    if self._shutdown and not any(
+                        c.queue for c in self._classes.values()
+                    ):
+                        return
+                    self._condition.wait()
+                    scheduling_class = self._next_class()
+
+                job = scheduling_class.queue.popleft()
+                scheduling_class.in_flight += 1
+                self._in_flight += 1
+                self._virtual_time = scheduling_class.virtual_time
+                scheduling_class.virtual_time += 1.0 / scheduling_class.weight
+                future, context, func, args, kwargs, queued_at = job
+                scheduling_class.waits.append(time.monotonic() - queued_at)
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(context.run(func, *args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._condition:
+                scheduling_class.in_flight -= 1
+                scheduling_class.completed += 1
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth, in-flight calls and wait times per class."""
+        with self._condition:
+            snapshot = {
+                name: (len(c.queue), c.in_flight, c.completed, list(c.waits))
+                for name, c in self._classes.items()
+            }
+
+        stats = {}
+        for name, (depth, in_flight, completed, waits) in snapshot.items():
+            stats[name] = {
+                "queue_depth": depth,
+                "in_flight": in_flight,
+                "completed": completed,
+                "wait_p50": percentile(waits, 0.5),
+                "wait_p99": percentile(waits, 0.99),
+                "wait_max": max(waits, default=0.0),
+            }
+        return stats
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting jobs; queued jobs still run before workers exit."""
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
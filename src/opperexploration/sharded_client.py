@@ -0,0 +1,234 @@
+"""Sharded client module for Opper AI exploration
+
+Spreads calls over several API keys (or projects), each with its own client,
+connection pool and rate limit, so throughput grows by adding keys.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from opperai import Opper
+from opperai.errors import APIError
+
+from opperexploration.resilience import DeadlineExceeded, remaining
+
+# An API key, optionally with its own calls-per-minute quota
+Credential = Union[str, Tuple[str, Optional[int]]]
+
+
+class QuotaExhausted(Exception):
+    """Raised when no shard gets quota back within the allowed wait."""
+
+
+class Shard:
+    """One API key with its own client and a rolling one minute call quota."""
+
+    def __init__(self, name: str, client: Opper, quota_per_minute: Optional[int]):
+        self.name = name
+        self.client = client
+        self.quota_per_minute = quota_per_minute
+        self.in_flight = 0
+        self.total_calls = 0
+        self.throttled_until = 0.0
+        self._recent: deque = deque()
+
+    def record_call(self, now: float) -> None:
+        self.in_flight += 1
+        self.total_calls += 1
+        self._recent.append(now)
+
+    def calls_last_minute(self, now: float) -> int:
+        while self._recent and now - self._recent[0] >= 60:
+            self._recent.popleft()
+        return len(self._recent)
+
+    def remaining_quota(self, now: float) -> float:
+        """Share of the per-minute quota left, 1.0 when unlimited."""
+        calls = self.calls_last_minute(now)
+        if not self.quota_per_minute:
+            return 1.0
+        return max(0.0, 1 - calls / self.quota_per_minute)
+
+    def quota_available_in(self, now: float) -> float:
+        """Seconds until the shard may take another call, 0.0 if it can now."""
+        available_in = max(0.0, self.throttled_until - now)
+        if not self.remaining_quota(now):
+            available_in = max(available_in, self._recent[0] + 60 - now)
+        return available_in
+
+
+class ShardedOpper:
+    """Opper clients for a set of API keys, picked by load for every call.
+
+    Each key may have its own per-minute quota, given as a ``(key, quota)``
+    pair; plain keys use ``quota_per_minute``. Shards that used up their quota
+    are skipped, and calls go to the shard with the fewest calls in flight
+    among the rest, preferring the one with the most quota left on a tie. When
+    every shard is out of quota the call waits for one to free up, at most
+    ``max_wait`` seconds or what is left of the current resilience deadline,
+    and raises QuotaExhausted after that. A shard that answers with a 429 is
+    skipped for ``rate_limit_cooldown`` seconds, or as long as its Retry-After
+    header asks.
+
+    Every acquire() counts as one request, so acquire once per request: inside
+    the callable that Resilience.call retries, not around it. A retry after a
+    429 then goes to another shard. Function, knowledge base and span ids only
+    exist in the project they were created in, so workloads using them pass a
+    ``pin`` key and always get the same shard, or create such resources once
+    per shard up front and pass ``shard`` explicitly.
+
+    Example:
+        sharded = ShardedOpper.from_env()
+        results = resilience.call(
+            sharded.call,
+            endpoint="knowledge.query",
+            method="knowledge.query",
+            pin="kb:Tickets",
+            knowledge_base_id=kb.id,
+            query="...",
+        )
+    """
+
+    def __init__(
+        self,
+        api_keys: Sequence[Credential],
+        quota_per_minute: Optional[int] = None,
+        max_wait: float = 60.0,
+        rate_limit_cooldown: float = 10.0,
+    ):
+        if not api_keys:
+            raise ValueError("At least one API key is required")
+        credentials = [
+            (key, quota_per_minute) if isinstance(key, str) else key for key in api_keys
+        ]
+        # Every Opper instance has its own HTTP client and thus connection pool
+        self.shards = [
+            Shard(f"key-{i}", Opper(http_bearer=key), quota)
+            for i, (key, quota) in enumerate(credentials)
+        ]
+        self.max_wait = max_wait
+        self.rate_limit_cooldown = rate_limit_cooldown
+        self._pins: Dict[str, Shard] = {}
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_env(cls, quota_per_minute: Optional[int] = None) -> "ShardedOpper":
+        """Use the comma separated OPPER_API_KEYS, or OPPER_API_KEY if unset.
+
+        A key may be followed by its own quota, e.g. ``first-key:600,second-key``.
+        """
+        keys = os.getenv("OPPER_API_KEYS") or os.getenv("OPPER_API_KEY", "")
+        credentials: List[Credential] = []
+        for entry in (k.strip() for k in keys.split(",")):
+            key, _, quota = entry.rpartition(":")
+            if key and quota.isdigit():
+                credentials.append((key, int(quota)))
+            elif entry:
+                credentials.append(entry)
+        return cls(credentials, quota_per_minute)
+
+    def _pick(self, now: float) -> Optional[Shard]:
+        available = [s for s in self.shards if not s.quota_available_in(now)]
+        if not available:
+            return None
+        return min(available, key=lambda s: (s.in_flight, -s.remaining_quota(now)))
+
+    def _select(
+        self, pin: Optional[str], shard: Optional[Shard], now: float
+    ) -> Tuple[Optional[Shard], float]:
+        """The shard to use now, or None and the seconds until one frees up."""
+        if shard is None and pin is not None:
+            shard = self._pins.get(pin)
+        if shard is None:
+            shard = self._pick(now)
+            if shard is None:
+                return None, min(s.quota_available_in(now) for s in self.shards)
+            if pin is not None:
+                self._pins[pin] = shard
+        available_in = shard.quota_available_in(now)
+        return (shard, 0.0) if not available_in else (None, available_in)
+
+    def _cooldown(self, error: APIError) -> float:
+        headers = error.raw_response.headers if error.raw_response else {}
+        retry_after = headers.get("retry-after", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+        return self.rate_limit_cooldown
+
+    @contextmanager
+    def acquire(
+        self, pin: Optional[str] = None, shard: Optional[Shard] = None
+    ) -> Iterator[Shard]:
+        """Reserve a shard for one request.
+
+        Picks the least loaded shard with quota left, the shard of a pinned
+        workload, or the given ``shard`` (e.g. to set up per-project resources).
+        """
+        budget = remaining()
+        bounded_by_deadline = budget is not None and budget < self.max_wait
+        max_wait = budget if bounded_by_deadline else self.max_wait
+        wait_until = time.monotonic() + max_wait
+
+        requested = shard
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                shard, available_in = self._select(pin, requested, now)
+                if shard is not None:
+                    break
+                if now + available_in > wait_until:
+                    if bounded_by_deadline:
+                        raise DeadlineExceeded("Deadline passed waiting for quota")
+                    raise QuotaExhausted(
+                        f"No API key has quota left for {available_in:.1f}s"
+                    )
+                self._condition.wait(available_in)
+            shard.record_call(now)
+        try:
+            yield shard
+        except APIError as e:
+            if e.status_code == 429:
+                with self._condition:
+                    shard.throttled_until = time.monotonic() + self._cooldown(e)
+            raise
+        finally:
+            with self._condition:
+                shard.in_flight -= 1
+
+    def call(
+        self,
+        method: str,
+        *,
+        pin: Optional[str] = None,
+        shard: Optional[Shard] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Call an SDK method by its dotted path, e.g. ``"functions.call"``."""
+        with self.acquire(pin, shard) as shard:
+            target: Any = shard.client
+            for attribute in method.split("."):
+                target = getattr(target, attribute)
+            return target(**kwargs)
+
+    def utilization(self) -> Dict[str, Dict[str, Any]]:
+        """In-flight calls, calls in the last minute and quota use per shard."""
+        with self._condition:
+            now = time.monotonic()
+            usage = {}
+            for shard in self.shards:
+                usage[shard.name] = {
+                    "in_flight": shard.in_flight,
+                    "calls_last_minute": shard.calls_last_minute(now),
+                    "total_calls": shard.total_calls,
+                    "quota_per_minute": shard.quota_per_minute,
+                    "quota_used": 1 - shard.remaining_quota(now),
+                    "throttled_for": max(0.0, shard.throttled_until - now),
+                    "pinned_workloads": sorted(
+                        p for p, s in self._pins.items() if s is shard
+                    ),
+                }
+            return usage
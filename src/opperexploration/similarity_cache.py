@@ -0,0 +1,231 @@
+"""Similarity cache module for Opper AI exploration
+
+Reuses call results for inputs that are near-duplicates of earlier ones, such as
+"Can't login" and "cannot log in!". Inputs are normalized and embedded locally
+with hashed character n-grams, so no extra model calls or dependencies are needed.
+"""
+
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from opperexploration.stats import percentile
+
+# Vector plus the numbers in the input, which must match exactly since n-grams
+# barely tell "3 rooms" from "5 rooms"
+Key = Tuple[Dict[int, float], Tuple[str, ...]]
+
+_CONTRACTIONS = {
+    "can't": "cannot",
+    "won't": "will not",
+    "n't": " not",
+    "'re": " are",
+    "'m": " am",
+    "'ve": " have",
+    "'ll": " will",
+}
+
+
+def normalize(value: Any) -> str:
+    """Normalize an input to a canonical lowercase string."""
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True)
+    text = value.lower().replace("’", "'")
+    for contraction, expansion in _CONTRACTIONS.items():
+        text = text.replace(contraction, expansion)
+    return " ".join(re.findall(r"\w+", text))
+
+
+def vectorize(text: str, ngram: int = 3, dims: int = 2048) -> Dict[int, float]:
+    """Embed normalized text as an L2-normalized sparse vector of hashed n-grams.
+
+    Spaces are dropped before taking n-grams so "log in" and "login" match.
+    """
+    compact = text.replace(" ", "")
+    if len(compact) < ngram:
+        grams = [compact] if compact else []
+    else:
+        grams = [compact[i : i + ngram] for i in range(len(compact) - ngram + 1)]
+
+    counts = Counter(zlib.crc32(g.encode("utf-8")) % dims for g in grams)
+    norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+    return {bucket: count / norm for bucket, count in counts.items()}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(bucket, 0.0) for bucket, weight in a.items())
+
+
+class _FunctionIndex:
+    """Entries for one function with an inverted index from bucket to entry."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[int, Tuple[Key, Any, float]]" = OrderedDict()
+        self.postings: Dict[int, set] = {}
+        self._next_id = 0
+
+    def add(self, key: Key, value: Any, stored_at: float) -> None:
+        entry_id = self._next_id
+        self._next_id += 1
+        self.entries[entry_id] = (key, value, stored_at)
+        for bucket in key[0]:
+            self.postings.setdefault(bucket, set()).add(entry_id)
+        while len(self.entries) > self.max_entries:
+            self._evict()
+
+    def _evict(self) -> None:
+        entry_id, ((vector, _), _, _) = self.entries.popitem(last=False)
+        for bucket in vector:
+            ids = self.postings.get(bucket)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self.postings[bucket]
+
+    def nearest(self, key: Key, not_before: float) -> Tuple[float, Any]:
+        """Most similar entry stored at or after ``not_before``."""
+        vector, numbers = key
+        candidates = set()
+        for bucket in vector:
+            candidates.update(self.postings.get(bucket, ()))
+
+        best_score, best_id = 0.0, None
+        for entry_id in candidates:
+            (entry_vector, entry_numbers), _, stored_at = self.entries[entry_id]
+            if entry_numbers != numbers or stored_at < not_before:
+                continue
+            score = cosine(vector, entry_vector)
+            if score > best_score:
+                best_score, best_id = score, entry_id
+
+        if best_id is None:
+            return 0.0, None
+        self.entries.move_to_end(best_id)
+        return best_score, self.entries[best_id][1]
+
+
+class SimilarityCache:
+    """Nearest-neighbour response cache keyed by function name and input.
+
+    A cached result is reused when the most similar earlier input for the same
+    function, among those containing the same numbers, reaches that function's
+    threshold (``thresholds``, falling back to ``default_threshold``).
+
+    Results that also depend on something besides the free-text input, such as
+    retrieved documents, pass it as ``context``: only entries stored with an
+    equal context are considered. Entries older than ``ttl`` seconds are
+    never reused.
+    """
+
+    def __init__(
+        self,
+        default_threshold: float = 0.9,
+        thresholds: Optional[Dict[str, float]] = None,
+        max_entries: int = 1000,
+        ngram: int = 3,
+        dims: int = 2048,
+        ttl: Optional[float] = None,
+    ):
+        self.default_threshold = default_threshold
+        self.thresholds = thresholds or {}
+        self.max_entries = max_entries
+        self.ngram = ngram
+        self.dims = dims
+        self.ttl = ttl
+        self._indexes: Dict[Tuple[str, Optional[str]], _FunctionIndex] = {}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, value: Any) -> Key:
+        text = normalize(value)
+        numbers = tuple(re.findall(r"\d+", text))
+        return vectorize(text, self.ngram, self.dims), numbers
+
+    @staticmethod
+    def _fingerprint(context: Any) -> Optional[str]:
+        if context is None:
+            return None
+        encoded = json.dumps(context, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _record(self, function: str, similarity: float, hit: bool) -> None:
+        stats = self._stats.setdefault(
+            function, {"hits": 0, "misses": 0, "similarities": deque(maxlen=10000)}
+        )
+        stats["hits" if hit else "misses"] += 1
+        stats["similarities"].append(similarity)
+
+    def get(self, function: str, value: Any, context: Any = None) -> Optional[Any]:
+        """Return the cached result for a similar enough input, if any."""
+        key = self._key(value)
+        threshold = self.thresholds.get(function, self.default_threshold)
+        not_before = time.monotonic() - self.ttl if self.ttl else float("-inf")
+        with self._lock:
+            index = self._indexes.get((function, self._fingerprint(context)))
+            similarity, result = (
+                index.nearest(key, not_before) if index else (0.0, None)
+            )
+            hit = result is not None and similarity >= threshold
+            self._record(function, similarity, hit)
+        return result if hit else None
+
+    def put(self, function: str, value: Any, result: Any, context: Any = None) -> None:
+        key = self._key(value)
+        index_key = (function, self._fingerprint(context))
+        with self._lock:
+            if index_key not in self._indexes:
+                self._indexes[index_key] = _FunctionIndex(self.max_entries)
+            self._indexes[index_key].add(key, result, time.monotonic())
+
+    def get_or_call(
+        self,
+        function: str,
+        value: Any,
+        call: Callable[[], Any],
+        context: Any = None,
+    ) -> Any:
+        """Return a cached result for ``value`` or compute and store a new one."""
+        result = self.get(function, value, context)
+        if result is None:
+            result = call()
+            self.put(function, value, result, context)
+        return result
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Hit rate and best-match similarity distribution per function."""
+        with self._lock:
+            stats = {name: dict(s) for name, s in self._stats.items()}
+
+        report = {}
+        for function, s in stats.items():
+            lookups = s["hits"] + s["misses"]
+            similarities: List[float] = sorted(s["similarities"])
+            report[function] = {
+                "lookups": lookups,
+                "hits": s["hits"],
+                "hit_rate": s["hits"] / lookups if lookups else 0.0,
+                "similarity_p50": percentile(similarities, 0.5),
+                "similarity_p90": percentile(similarities, 0.9),
+                "similarity_histogram": _histogram(similarities),
+            }
+        return report
+
+
+def _histogram(values: List[float], bins: int = 10) -> Dict[str, int]:
+    counts = [0] * bins
+    for value in values:
+        counts[min(bins - 1, max(0, int(value * bins)))] += 1
+    return {
+        f"{i / bins:.1f}-{(i + 1) / bins:.1f}": count
+        for i, count in enumerate(counts)
+        if count
+    }
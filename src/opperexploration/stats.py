@@ -0,0 +1,16 @@
+"""Statistics helpers for Opper AI exploration
+
+Shared by the modules that report latency and similarity distributions, so
+their percentiles are computed the same way.
+"""
+
+import math
+from typing import Iterable
+
+
+def percentile(values: Iterable[float], q: float) -> float:
+    """Nearest-rank percentile of ``values``, 0.0 when there are none."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
@@ -6,6 +6,10 @@ from typing import List
 from opperai import Opper
 from pydantic import BaseModel, Field
 
+from opperexploration.resilience import Resilience
+
+resilience = Resilience(timeout=20)
+
 
 # Input schema with field descriptions
 class KBQueryInput(BaseModel):
@@ -23,7 +27,9 @@ def main():
     opper = Opper(http_bearer=os.getenv("OPPER_API_KEY", ""))
 
     # Task definition and completion run
-    response = opper.call(
+    response = resilience.call(
+        opper.call,
+        endpoint="call",
         name="mini_kb_query",
         instructions="Given the list of bullet-point facts, answer the question.",
         input_schema=KBQueryInput,
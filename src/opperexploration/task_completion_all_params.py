@@ -6,6 +6,8 @@ from typing import List, Literal
 from opperai import Opper
 from pydantic import BaseModel, Field
 
+from opperexploration.resilience import Resilience
+
 
 # Input schema with field descriptions
 class KBQueryInput(BaseModel):
@@ -27,9 +29,12 @@ class KBQueryOutput(BaseModel):
 
 def main():
     opper = Opper(http_bearer=os.getenv("OPPER_API_KEY", ""))
+    resilience = Resilience(timeout=30)
 
     # Task definition and completion run
-    response = opper.call(
+    response = resilience.call(
+        opper.call,
+        endpoint="call",
         name="mini_kb_query",
         tags={
             "user": "lofkrantz",
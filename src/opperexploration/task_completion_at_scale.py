@@ -1,11 +1,14 @@
 """Task completion module for Opper AI exploration"""
 
-import os
 from typing import List
 
-from opperai import Opper
+from opperai.errors import NotFoundError
 from pydantic import BaseModel, Field
 
+from opperexploration.resilience import Resilience
+from opperexploration.scheduler import BATCH, INTERACTIVE, PriorityScheduler
+from opperexploration.sharded_client import Shard, ShardedOpper
+
 
 # Input schema with field descriptions
 class KBQueryInput(BaseModel):
@@ -25,19 +28,27 @@ class KBQueryOutput(BaseModel):
     )
 
 
-def main():
-    opper = Opper(http_bearer=os.getenv("OPPER_API_KEY", ""))
+resilience = Resilience(timeout=20)
 
-    # Create a function in Opper AI
-    function_name = "mini_kb_query2"
 
-    # Check if function exists
+def get_or_create_function(sharded: ShardedOpper, shard: Shard, function_name: str):
+    """Get the function by name in a shard's project, creating it if needed."""
     try:
-        function = opper.functions.get_by_name(name=function_name)
+        function = resilience.call(
+            sharded.call,
+            endpoint=f"{shard.name}:functions.get_by_name",
+            method="functions.get_by_name",
+            shard=shard,
+            name=function_name,
+        )
         print(f"Function '{function_name}' already exists with ID: {function.id}")
-    except Exception:
+    except NotFoundError:
         print(f"Function '{function_name}' does not exist. Creating it...")
-        function = opper.functions.create(
+        function = resilience.call(
+            sharded.call,
+            endpoint=f"{shard.name}:functions.create",
+            method="functions.create",
+            shard=shard,
             name=function_name,
             instructions=(
                 "Given the list of bullet-point facts, then answer the question."
@@ -47,21 +58,66 @@ def main():
             configuration={"invocation.few_shot.count": 3},
         )
         print(f"Created function '{function_name}' with ID: {function.id}")
+    return function
+
+
+def main():
+    # One client per API key in OPPER_API_KEYS (or just OPPER_API_KEY), calls go
+    # to the least loaded key
+    sharded = ShardedOpper.from_env()
 
-    # Completion run
-    response = opper.functions.call(
-        function_id=function.id,
-        input={
-            "facts": [
-                "Jupiter is the largest planet in the Solar System.",
-                "The Great Red Spot is a giant storm on Jupiter.",
-                "Saturn possesses the most extensive ring system in the Solar System.",
-            ],
-            "question": "What planet has the largest ring system?",
-        },
+    # Create a function in Opper AI
+    function_name = "mini_kb_query2"
+
+    facts = [
+        "Jupiter is the largest planet in the Solar System.",
+        "The Great Red Spot is a giant storm on Jupiter.",
+        "Saturn possesses the most extensive ring system in the Solar System.",
+    ]
+
+    # Function ids are scoped to the key's project, so each key gets its own.
+    # They are set up front, so answering never waits on a registration.
+    function_ids = {
+        shard.name: get_or_create_function(sharded, shard, function_name).id
+        for shard in sharded.shards
+    }
+
+    # Each attempt acquires a shard of its own, so every request counts against
+    # a key's quota and a retry after a 429 goes to another key
+    def call_function(question: str, timeout_ms: int):
+        with sharded.acquire() as shard:
+            return shard.client.functions.call(
+                function_id=function_ids[shard.name],
+                input={"facts": facts, "question": question},
+                timeout_ms=timeout_ms,
+            )
+
+    def answer(question: str):
+        return resilience.call(
+            call_function, endpoint="functions.call", question=question
+        )
+
+    # Completion runs, queued as batch traffic. Two of the four workers are
+    # reserved for interactive calls, so batch jobs run two at a time and a user
+    # question asked in the middle of the batch does not wait behind it.
+    scheduler = PriorityScheduler(max_concurrency=4)
+    questions = [
+        "What planet has the largest ring system?",
+        "Which planet hosts the Great Red Spot?",
+        "What is the largest planet in the Solar System?",
+    ]
+    futures = [scheduler.submit(BATCH, answer, question) for question in questions]
+    interactive = scheduler.submit(
+        INTERACTIVE, answer, "Is the Great Red Spot a storm?"
     )
 
-    print(response.json_payload)
+    print(f"Interactive answer: {interactive.result().json_payload}")
+    for future in futures:
+        print(future.result().json_payload)
+
+    print(f"Scheduler stats: {scheduler.stats()}")
+    print(f"Key utilization: {sharded.utilization()}")
+    scheduler.shutdown()
 
 
 if __name__ == "__main__":
@@ -7,6 +7,15 @@ from opperai import Opper
 # Our SDK supports Pydantic to provide structured output
 from pydantic import BaseModel
 
+from opperexploration.function_promotion import FunctionPromoter
+from opperexploration.resilience import Resilience
+
+resilience = Resilience(timeout=20)
+
+# The extractRoom definition is the same for every test, so after the first call
+# it is registered as a function and later calls only send the room text
+promoter = FunctionPromoter(promote_after=2)
+
 
 # Define the output structure
 class RoomDescription(BaseModel):
@@ -16,6 +25,19 @@ class RoomDescription(BaseModel):
     hotel_name: str
 
 
+def extract_room(opper: Opper, text: str):
+    """Extract room details; every test gets its own call and span to score"""
+    return resilience.call(
+        promoter.call,
+        endpoint="call",
+        opper=opper,
+        name="extractRoom",
+        instructions="Extract details about the room from the provided text",
+        input=text,
+        output_schema=RoomDescription,
+    )
+
+
 def test_room_extraction():
     """Test room extraction functionality with evaluation metrics"""
     opper = Opper(http_bearer=os.getenv("OPPER_API_KEY"))
@@ -28,14 +50,10 @@ def test_room_extraction():
         "unforgettable stay."
     )
 
-    # Assumes that the function 'extractRoom' is already defined and available
-    # in the Opper AI environment
-    completion = opper.call(
-        name="extractRoom",
-        instructions="Extract details about the room from the provided text",
-        input=test_input,
-        output_schema=RoomDescription,
-    )
+    # The first call is sent inline, later ones go to the registered function:
+    # 'extractRoom' itself if it exists with the same definition, otherwise
+    # 'extractRoom-<signature>' which is created on first use
+    completion = extract_room(opper, test_input)
 
     result = completion.json_payload
     print("Test 1 - Basic extraction:")
@@ -45,7 +63,9 @@ def test_room_extraction():
     required_fields = ["room_count", "view", "bed_size", "hotel_name"]
     has_all_fields = all(field in result for field in required_fields)
 
-    opper.span_metrics.create_metric(
+    resilience.call(
+        opper.span_metrics.create_metric,
+        endpoint="span_metrics.create_metric",
         span_id=completion.span_id,
         dimension="has_all_required_fields",
         value=1 if has_all_fields else 0,
@@ -55,7 +75,9 @@ def test_room_extraction():
     # Evaluation 2: Check if room count is reasonable (1-10)
     room_count_valid = 1 <= result.get("room_count", 0) <= 10
 
-    opper.span_metrics.create_metric(
+    resilience.call(
+        opper.span_metrics.create_metric,
+        endpoint="span_metrics.create_metric",
         span_id=completion.span_id,
         dimension="room_count_valid",
         value=1 if room_count_valid else 0,
@@ -66,7 +88,9 @@ def test_room_extraction():
     expected_hotel = "The Grand Hotel"
     hotel_correct = result.get("hotel_name", "").lower() == expected_hotel.lower()
 
-    opper.span_metrics.create_metric(
+    resilience.call(
+        opper.span_metrics.create_metric,
+        endpoint="span_metrics.create_metric",
         span_id=completion.span_id,
         dimension="hotel_name_accuracy",
         value=1 if hotel_correct else 0,
@@ -86,12 +110,7 @@ def test_edge_cases():
     # Test case 2: Minimal information
     test_input_minimal = "A room at Hotel ABC with a bed."
 
-    completion = opper.call(
-        name="extractRoom",
-        instructions="Extract details about the room from the provided text",
-        input=test_input_minimal,
-        output_schema=RoomDescription,
-    )
+    completion = extract_room(opper, test_input_minimal)
 
     result = completion.json_payload
     print("Test 2 - Minimal information:")
@@ -104,7 +123,9 @@ def test_edge_cases():
         and result.get("bed_size", "") != ""
     )
 
-    opper.span_metrics.create_metric(
+    resilience.call(
+        opper.span_metrics.create_metric,
+        endpoint="span_metrics.create_metric",
         span_id=completion.span_id,
         dimension="handles_minimal_info",
         value=1 if has_reasonable_defaults else 0,
@@ -148,12 +169,7 @@ def test_multiple_scenarios():
     for i, test_case in enumerate(test_cases, 3):
         print(f"Test {i} - {test_case['name']}:")
 
-        completion = opper.call(
-            name="extractRoom",
-            instructions="Extract details about the room from the provided text",
-            input=test_case["input"],
-            output_schema=RoomDescription,
-        )
+        completion = extract_room(opper, test_case["input"])
 
         result = completion.json_payload
         print(f"Result: {result}")
@@ -164,7 +180,9 @@ def test_multiple_scenarios():
         )
         accuracy_scores.append(1 if hotel_correct else 0)
 
-        opper.span_metrics.create_metric(
+        resilience.call(
+            opper.span_metrics.create_metric,
+            endpoint="span_metrics.create_metric",
             span_id=completion.span_id,
             dimension="hotel_extraction_accuracy",
             value=1 if hotel_correct else 0,
@@ -188,6 +206,8 @@ def main():
     test_edge_cases()
     test_multiple_scenarios()
 
+    print()
+    print(f"Promoted functions: {promoter.promoted()}")
     print("✅ All tests completed!")
 
 
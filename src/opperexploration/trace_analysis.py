@@ -0,0 +1,226 @@
+"""Trace analysis module for Opper AI exploration
+
+Explains where the time of a root span went: the critical path through its
+children, latency per child name, idle gaps where no child was running and the
+parallelism that was actually achieved.
+"""
+
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from opperai import Opper
+from pydantic import BaseModel
+
+from opperexploration.stats import percentile
+
+
+class SpanTiming(BaseModel):
+    id: str
+    name: str
+    parent_id: Optional[str] = None
+    start: float  # seconds since the epoch
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class SpanRecorder:
+    """Records span timings locally, e.g. around SDK calls inside a session span.
+
+    Example:
+        recorder = SpanRecorder()
+        with recorder.span("session") as root_id:
+            with recorder.span("analyze", parent_id=root_id):
+                opper.functions.call(...)
+    """
+
+    def __init__(self):
+        self.spans: List[SpanTiming] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(
+        self, name: str, parent_id: Optional[str] = None, span_id: Optional[str] = None
+    ) -> Iterator[str]:
+        span_id = span_id or str(uuid.uuid4())
+        start = time.time()
+        try:
+            yield span_id
+        finally:
+            timing = SpanTiming(
+                id=span_id, name=name, parent_id=parent_id, start=start, end=time.time()
+            )
+            with self._lock:
+                self.spans.append(timing)
+
+
+def fetch_spans(
+    opper: Opper, trace_id: str, timeout_ms: Optional[int] = None
+) -> List[SpanTiming]:
+    """Fetch the spans of a trace from Opper, skipping spans still in progress."""
+    trace = opper.traces.get(trace_id=trace_id, timeout_ms=timeout_ms)
+    spans = []
+    for span in trace.spans or []:
+        if not span.id or not span.start_time or not span.end_time:
+            continue
+        spans.append(
+            SpanTiming(
+                id=span.id,
+                name=span.name or "",
+                parent_id=span.parent_id or None,
+                start=span.start_time.timestamp(),
+                end=span.end_time.timestamp(),
+            )
+        )
+    return spans
+
+
+def _merge(intervals: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    merged: List[Tuple[float, float]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _critical_path(
+    span: SpanTiming, children: Dict[str, List[SpanTiming]], depth: int = 0
+) -> List[Tuple[int, SpanTiming]]:
+    """Walk back from the end of a span, always taking the child that finished
+    last before the cursor, and recurse into each child on the path."""
+    chain = []
+    cursor = span.end
+    remaining = list(children.get(span.id, []))
+    while remaining:
+        candidates = [c for c in remaining if c.end <= cursor]
+        if not candidates:
+            break
+        last = max(candidates, key=lambda c: c.end)
+        chain.append(last)
+        cursor = last.start
+        remaining = [c for c in candidates if c is not last]
+
+    path = []
+    for child in reversed(chain):
+        path.append((depth, child))
+        path.extend(_critical_path(child, children, depth + 1))
+    return path
+
+
+def analyze(spans: List[SpanTiming], root_id: str, top_n: int = 3) -> Dict[str, Any]:
+    """Analyze the span tree below ``root_id``."""
+    by_id = {span.id: span for span in spans}
+    if root_id not in by_id:
+        raise ValueError(f"Root span '{root_id}' not found")
+    root = by_id[root_id]
+
+    children: Dict[str, List[SpanTiming]] = {}
+    for span in spans:
+        if span.parent_id:
+            children.setdefault(span.parent_id, []).append(span)
+    direct = sorted(children.get(root_id, []), key=lambda s: s.start)
+
+    # Idle gaps are the parts of the root span not covered by any direct child
+    busy = _merge([(c.start, c.end) for c in direct])
+    gaps = []
+    cursor = root.start
+    for start, end in busy:
+        if start > cursor:
+            gaps.append((cursor, start))
+        cursor = max(cursor, end)
+    if root.end > cursor:
+        gaps.append((cursor, root.end))
+    busy_time = sum(end - start for start, end in busy)
+
+    latencies: Dict[str, List[float]] = {}
+    for child in direct:
+        latencies.setdefault(child.name, []).append(child.duration)
+
+    critical_path = _critical_path(root, children)
+    on_path = {span.id for depth, span in critical_path if depth == 0}
+
+    return {
+        "root": root.name,
+        "duration": root.duration,
+        "n_children": len(direct),
+        "busy_time": busy_time,
+        "idle_time": sum(end - start for start, end in gaps),
+        "parallelism": (
+            sum(c.duration for c in direct) / busy_time if busy_time else 0.0
+        ),
+        "critical_path": [
+            {
+                "depth": depth,
+                "name": span.name,
+                "id": span.id,
+                "duration": span.duration,
+            }
+            for depth, span in critical_path
+        ],
+        "latency_by_name": {
+            name: {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                "p50": percentile(values, 0.5),
+                "p90": percentile(values, 0.9),
+                "max": max(values),
+            }
+            for name, values in latencies.items()
+        },
+        "idle_gaps": [
+            {"offset": start - root.start, "duration": end - start}
+            for start, end in sorted(gaps, key=lambda g: g[1] - g[0], reverse=True)
+        ],
+        "top_offenders": [
+            {
+                "name": child.name,
+                "id": child.id,
+                "duration": child.duration,
+                "share": child.duration / root.duration if root.duration else 0.0,
+                "on_critical_path": child.id in on_path,
+            }
+            for child in sorted(direct, key=lambda s: s.duration, reverse=True)[:top_n]
+        ],
+    }
+
+
+def format_report(analysis: Dict[str, Any]) -> str:
+    """Render the output of ``analyze`` as a short human readable report."""
+    duration = analysis["duration"]
+    lines = [
+        f"Trace '{analysis['root']}': {duration:.2f}s, "
+        f"{analysis['n_children']} child spans",
+        f"  busy {analysis['busy_time']:.2f}s, idle {analysis['idle_time']:.2f}s, "
+        f"parallelism {analysis['parallelism']:.2f}x",
+        "  Critical path:",
+    ]
+    for step in analysis["critical_path"]:
+        indent = "  " * step["depth"]
+        lines.append(f"    {indent}{step['name']} {step['duration']:.2f}s")
+    lines.append("  Latency by child:")
+    for name, stats in analysis["latency_by_name"].items():
+        lines.append(
+            f"    {name}: n={stats['count']} p50={stats['p50']:.2f}s "
+            f"p90={stats['p90']:.2f}s max={stats['max']:.2f}s"
+        )
+    if analysis["idle_gaps"]:
+        largest = analysis["idle_gaps"][0]
+        lines.append(
+            f"  Largest idle gap: {largest['duration']:.2f}s "
+            f"at +{largest['offset']:.2f}s"
+        )
+    lines.append("  Top offenders:")
+    for offender in analysis["top_offenders"]:
+        marker = " (critical path)" if offender["on_critical_path"] else ""
+        lines.append(
+            f"    {offender['name']} {offender['id']}: {offender['duration']:.2f}s "
+            f"({offender['share']:.0%} of trace){marker}"
+        )
+    return "\n".join(lines)
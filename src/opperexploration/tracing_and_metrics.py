@@ -3,8 +3,12 @@
 import os
 
 from opperai import Opper
+from opperai.errors import NotFoundError
 from pydantic import BaseModel, Field
 
+from opperexploration.resilience import Resilience
+from opperexploration.trace_analysis import SpanRecorder, analyze, format_report
+
 
 # Input schema for person analysis
 class PersonAnalysisInput(BaseModel):
@@ -22,17 +26,24 @@ class PersonAnalysisOutput(BaseModel):
 
 def main():
     opper = Opper(http_bearer=os.getenv("OPPER_API_KEY"))
+    resilience = Resilience(timeout=20)
 
     # Create a function in Opper AI
     function_name = "analyze_person_data"
 
     # Check if function exists
     try:
-        function = opper.functions.get_by_name(name=function_name)
+        function = resilience.call(
+            opper.functions.get_by_name,
+            endpoint="functions.get_by_name",
+            name=function_name,
+        )
         print(f"Function '{function_name}' already exists with ID: {function.id}")
-    except Exception:
+    except NotFoundError:
         print(f"Function '{function_name}' does not exist. Creating it...")
-        function = opper.functions.create(
+        function = resilience.call(
+            opper.functions.create,
+            endpoint="functions.create",
             name=function_name,
             instructions=(
                 "Analyze this person's data and provide insights about their profile. "
@@ -45,7 +56,11 @@ def main():
         print(f"Created function '{function_name}' with ID: {function.id}")
 
     # Create a trace to track this processing session
-    session_span = opper.spans.create(name="person_data_processing")
+    session_span = resilience.call(
+        opper.spans.create,
+        endpoint="spans.create",
+        name="person_data_processing",
+    )
 
     # Sample data to process
     sample_data = [
@@ -55,22 +70,32 @@ def main():
         {"name": "Diana", "age": 28, "city": "Boston"},
     ]
 
-    personas = []
-    for record in sample_data:
-        # Analyze the record and connect it to the trace
-        completion = opper.functions.call(
-            function_id=function.id,
-            input=record,
-            parent_span_id=session_span.id,
-        )
-
-        analysis = completion.json_payload
-        personas.append(analysis)
+    # Record span timings locally as well, so a slow batch can be analyzed
+    # without waiting for the trace to be ingested (see trace_analysis.fetch_spans)
+    recorder = SpanRecorder()
 
-        print(f"Analysis for {record['name']}: {analysis}")
+    personas = []
+    with recorder.span("person_data_processing", span_id=session_span.id):
+        for record in sample_data:
+            # Analyze the record and connect it to the trace
+            with recorder.span(function_name, parent_id=session_span.id):
+                completion = resilience.call(
+                    opper.functions.call,
+                    endpoint="functions.call",
+                    function_id=function.id,
+                    input=record,
+                    parent_span_id=session_span.id,
+                )
+
+            analysis = completion.json_payload
+            personas.append(analysis)
+
+            print(f"Analysis for {record['name']}: {analysis}")
 
     # Update the trace with input and output information
-    opper.spans.update(
+    resilience.call(
+        opper.spans.update,
+        endpoint="spans.update",
         span_id=session_span.id,
         input=str(sample_data),
         output=str(personas),
@@ -79,13 +104,17 @@ def main():
 
     # Save a metric that captures number of personas that are blank
     # and attach it to the root span
-    opper.span_metrics.create_metric(
+    resilience.call(
+        opper.span_metrics.create_metric,
+        endpoint="span_metrics.create_metric",
         span_id=session_span.id,
         dimension="n_failed",
         value=sum(1 for persona in personas if persona is None),
         comment="Number of personas with failed summary",
     )
 
+    print(format_report(analyze(recorder.spans, session_span.id)))
+
 
 if __name__ == "__main__":
     main()
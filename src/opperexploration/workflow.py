@@ -0,0 +1,142 @@
+"""Workflow module for Opper AI exploration
+
+Runs multi-step flows as a dependency graph. Steps declare which other steps
+they need, independent steps run concurrently and every step runs at most once
+per run.
+"""
+
+import contextvars
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from opperexploration.resilience import Cancelled, cancel_on
+from opperexploration.trace_analysis import SpanRecorder
+
+
+class WorkflowError(Exception):
+    """Raised when a step fails; the original error is the ``__cause__``."""
+
+    def __init__(self, step: str, error: BaseException):
+        super().__init__(f"Step '{step}' failed: {error}")
+        self.step = step
+
+
+class Step:
+    def __init__(self, name: str, func: Callable[..., Any], inputs: Sequence[str]):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+
+
+class Workflow:
+    """A set of steps that declare their inputs by step name.
+
+    Each step is called with the results of its inputs as keyword arguments.
+
+    Example:
+        flow = Workflow("support_flow")
+        flow.add("kb", get_or_create_kb)
+        flow.add("unfiltered", query_unfiltered, inputs=["kb"])
+        flow.add("filtered", query_filtered, inputs=["kb"])
+        results = flow.run()
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.steps: Dict[str, Step] = {}
+
+    def add(
+        self, name: str, func: Callable[..., Any], inputs: Sequence[str] = ()
+    ) -> None:
+        if name in self.steps:
+            raise ValueError(f"Step '{name}' is already defined")
+        self.steps[name] = Step(name, func, inputs)
+
+    def _check(self, provided: Sequence[str]) -> None:
+        """Fail early on unknown inputs and dependency cycles."""
+        for step in self.steps.values():
+            for name in step.inputs:
+                if name not in self.steps and name not in provided:
+                    raise ValueError(f"Step '{step.name}' needs unknown input '{name}'")
+
+        resolved = set(provided)
+        pending = dict(self.steps)
+        while pending:
+            ready = [s for s in pending.values() if set(s.inputs) <= resolved]
+            if not ready:
+                raise ValueError(f"Dependency cycle between steps {sorted(pending)}")
+            for step in ready:
+                resolved.add(step.name)
+                del pending[step.name]
+
+    def run(
+        self,
+        max_workers: int = 4,
+        recorder: Optional[SpanRecorder] = None,
+        **provided: Any,
+    ) -> Dict[str, Any]:
+        """Run all steps and return their results by step name.
+
+        Keyword arguments are made available to steps as precomputed inputs.
+        When a step fails, steps that have not started yet are cancelled and a
+        WorkflowError is raised once the running steps have finished. Running
+        steps are cancelled too: their Resilience.call calls raise Cancelled
+        before the next attempt, and other work can poll
+        ``resilience.cancelled()``. Timings of the run and every step are
+        recorded in ``recorder`` when given.
+        """
+        self._check(list(provided))
+        recorder = recorder or SpanRecorder()
+        results: Dict[str, Any] = dict(provided)
+        pending: Dict[str, Step] = dict(self.steps)
+        running: Dict[Future, str] = {}
+        cancelled = threading.Event()
+
+        with recorder.span(self.name) as run_span_id:
+
+            def run_step(step: Step) -> Any:
+                if cancelled.is_set():
+                    raise Cancelled("Workflow cancelled")
+                inputs = {name: results[name] for name in step.inputs}
+                with cancel_on(cancelled), recorder.span(
+                    step.name, parent_id=run_span_id
+                ):
+                    return step.func(**inputs)
+
+            failure: Optional[WorkflowError] = None
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                while pending or running:
+                    if failure is None:
+                        ready = [
+                            s for s in pending.values() if set(s.inputs) <= set(results)
+                        ]
+                        for step in ready:
+                            del pending[step.name]
+                            # Each step runs in a copy of the caller's context so
+                            # deadlines set around run() apply to every step
+                            context = contextvars.copy_context()
+                            future = executor.submit(context.run, run_step, step)
+                            running[future] = step.name
+
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        if future.cancelled():
+                            continue
+                        error = future.exception()
+                        if error is None:
+                            results[name] = future.result()
+                        elif failure is None:
+                            failure = WorkflowError(name, error)
+                            failure.__cause__ = error
+                            cancelled.set()
+                            for other in running:
+                                other.cancel()
+
+            if failure is not None:
+                raise failure
+
+        return {name: results[name] for name in self.steps}